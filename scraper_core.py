@@ -0,0 +1,493 @@
+"""Home Depot 搜索抓取的核心工具：页面解析、分页请求与浏览器驱动，不依赖 Streamlit。"""
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时退回标准库，接口一致
+    import json as orjson
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台无法加文件锁，每次启动都使用独立的临时配置目录
+    fcntl = None
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- Selenium 相关导入 ---
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import SessionNotCreatedException, TimeoutException, WebDriverException
+
+# --- 页面解析与分页抓取工具 ---
+SITE_URL = "https://www.homedepot.com"
+SEARCH_URL = SITE_URL + "/s/{}"
+PAGE_SIZE = 24  # Home Depot 搜索结果每页固定 24 个商品，翻页参数 Nao 为偏移量
+MAX_HTTP_WORKERS = 8  # 并行抓取分页时的最大线程数
+NEXT_PAGE_WAIT = 5  # 首页数据就绪后等待"下一页"链接渲染的最长时间（秒）
+PAGE_CACHE_MAX_ENTRIES = 500  # 条件请求缓存最多保留的分页数
+RESULT_CACHE_MAX_ENTRIES = 100  # 搜索结果缓存最多保留的 (关键词, 页数) 组合数
+# 单个商品的抓取结果；link 为站内相对路径，image_url 为含 <SIZE> 占位符的图片模板（缺图时为 None）
+ProductRecord = namedtuple('ProductRecord', ('name', 'current_price', 'original_price', 'link', 'image_url'))
+RESULT_COLUMNS = ProductRecord._fields
+
+# 浏览器与HTTP会话使用同一个UA，保证复用Cookie时两端身份一致
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
+HTTP_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+# 固定的浏览器配置目录：重启浏览器时沿用已有配置与Cookie，不必每次重新初始化。
+# 同一目录只能被一个Chrome使用，由 CHROME_PROFILE_LOCK 文件锁保证；已被占用时改用临时目录
+CHROME_PROFILE_DIR = os.path.join(tempfile.gettempdir(), "hd_scraper_profile")
+CHROME_PROFILE_LOCK = CHROME_PROFILE_DIR + ".lock"
+CHROME_DISK_CACHE_SIZE = 50 * 1024 * 1024  # 限制配置目录中的磁盘缓存大小（字节）
+CHROME_ARGUMENTS = (
+    "--headless",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--window-size=1920,1080",
+    f"--user-agent={USER_AGENT}",
+    "--blink-settings=imagesEnabled=false",
+    f"--disk-cache-size={CHROME_DISK_CACHE_SIZE}",
+)
+
+# 页面元素定位器
+PAGE_LINKS_LOCATOR = (By.CSS_SELECTOR, 'nav[aria-label="Pagination Navigation"] a[aria-label*="Go to Page"]')
+NEXT_PAGE_LOCATOR = (By.CSS_SELECTOR, 'a[aria-label="Skip to Next Page"]')
+PAGE_NUMBER_RE = re.compile(r'\d+')
+NAO_PARAM_RE = re.compile(r'Nao=\d+')
+
+# APOLLO_STATE 赋值语句的标记，直接用 find 截取JSON，无需正则或构建DOM树
+APOLLO_MARKER = 'window.__APOLLO_STATE__'
+APOLLO_MARKER_BYTES = APOLLO_MARKER.encode()
+
+# 在浏览器内直接取出APOLLO_STATE，避免序列化整个DOM：
+# 全局变量已赋值时返回其JSON序列化结果，否则退回返回所在脚本的文本
+APOLLO_SCRIPT_JS = (
+    "if (window.__APOLLO_STATE__) { return JSON.stringify(window.__APOLLO_STATE__); }"
+    "var s = Array.prototype.find.call(document.scripts, function (e) {"
+    " return e.text.indexOf('window.__APOLLO_STATE__') !== -1; });"
+    "return s ? s.text : null;"
+)
+
+def parse_apollo_script(script_text):
+    """从 window.__APOLLO_STATE__ 赋值脚本中截取并解析JSON，格式不符时返回 None。"""
+    start = script_text.find('{', script_text.find(APOLLO_MARKER))
+    end = script_text.rfind('}') + 1
+    if start == -1 or end <= start:
+        return None
+
+    return orjson.loads(script_text[start:end])
+
+def extract_apollo_state(html):
+    """
+    从页面HTML的原始字节中提取并解析 window.__APOLLO_STATE__ 数据块。
+
+    Args:
+        html (bytes): 未解码的页面内容。
+
+    Returns:
+        dict | None: 解析后的APOLLO_STATE，页面中不存在时返回 None。
+    """
+    marker_pos = html.find(APOLLO_MARKER_BYTES)
+    if marker_pos == -1:
+        return None
+
+    start = html.find(b'{', marker_pos)
+    end = html.rfind(b'}', start, html.find(b'</script>', start)) + 1
+    if start == -1 or end <= start:
+        return None
+
+    return orjson.loads(html[start:end])
+
+def wait_for_apollo_state(wait):
+    """
+    以短轮询间隔等待当前页面出现APOLLO_STATE，出现后立即取回并解析。
+
+    Returns:
+        dict | None: 解析后的APOLLO_STATE，脚本格式不符时返回 None。
+
+    Raises:
+        TimeoutException: 等待超时仍未出现数据脚本。
+    """
+    script_text = wait.until(lambda d: d.execute_script(APOLLO_SCRIPT_JS))
+    if script_text.startswith('{'):
+        return orjson.loads(script_text)
+    return parse_apollo_script(script_text)
+
+def to_price(value):
+    """把价格字段转换为 float，缺失或无法解析时返回 None。"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def is_ref_list(value):
+    """判断字段是否为 Apollo 的引用列表（[{'__ref': ...}, ...]）。"""
+    return isinstance(value, list) and bool(value) and isinstance(value[0], dict) and bool(value[0].get('__ref'))
+
+def resolve_ref(apollo_data, value):
+    """字段为 {'__ref': ...} 引用时返回其指向的规范化条目，否则原样返回。"""
+    if isinstance(value, dict) and '__ref' in value:
+        return apollo_data.get(value['__ref'])
+    return value
+
+def find_search_model(apollo_data):
+    """返回 ROOT_QUERY 中 searchModel(...) 字段对应的对象，结构不符时返回 None。"""
+    root = apollo_data.get('ROOT_QUERY')
+    if not isinstance(root, dict):
+        return None
+    search_key = next((k for k in root if k.startswith('searchModel')), None)
+    # searchModel 可能是内联对象，也可能是指向规范化条目的引用
+    search_model = resolve_ref(apollo_data, root[search_key]) if search_key else None
+    return search_model if isinstance(search_model, dict) else None
+
+def get_products_field(entry):
+    """
+    返回条目中引用列表形式的 products 字段。
+
+    带参数的字段在 Apollo 中以 products({"startIndex":0,...}) 形式作为键名，因此按前缀匹配。
+    """
+    return next((value for key, value in entry.items() if key.startswith('products') and is_ref_list(value)), None)
+
+def find_product_refs(apollo_data):
+    """
+    定位搜索结果的商品引用列表。
+
+    优先通过 ROOT_QUERY 中的 searchModel(...) 字段直接定位；结构不符时，
+    再逐个检查顶层条目中是否有引用列表形式的 products 字段。
+
+    Returns:
+        list: 形如 {'__ref': 'BaseProduct:...'} 的引用列表，未找到时为空列表。
+    """
+    search_model = find_search_model(apollo_data)
+    product_refs = get_products_field(search_model) if search_model else None
+    if product_refs:
+        return product_refs
+
+    for value in apollo_data.values():
+        if isinstance(value, dict):
+            product_refs = get_products_field(value)
+            if product_refs:
+                return product_refs
+    return []
+
+def parse_products(apollo_data):
+    """
+    从APOLLO_STATE中找出商品列表，整理为抓取结果。
+
+    Returns:
+        list[ProductRecord]: 当前页面的商品信息列表。
+    """
+    products_list = [apollo_data[ref['__ref']] for ref in find_product_refs(apollo_data)
+                     if ref.get('__ref') in apollo_data]
+
+    # 同一页商品的价格字段名（如 pricing({"storeId":...})）参数一致，只需查找一次
+    pricing_key = next((k for product in products_list for k in product if k.startswith('pricing')), None)
+
+    results = []
+    for product in products_list:
+        identifiers = product.get('identifiers') or {}
+        name = identifiers.get('productLabel', 'N/A')
+        if name == 'N/A':
+            continue
+
+        pricing_info = product.get(pricing_key) or {}
+        current_price = to_price(pricing_info.get('value'))
+        original_price = to_price(pricing_info.get('original'))
+        # 链接与图片保留原始的相对路径和尺寸模板，由展示层整列补全
+        link = identifiers.get('canonicalUrl') or '#'
+        # 常见情况下字段齐全，直接索引；缺图或空列表时留空，展示时使用占位图
+        try:
+            image_url = product['media']['images'][0]['url']
+        except (KeyError, IndexError, TypeError):
+            image_url = None
+
+        results.append(ProductRecord(name, current_price, original_price, link, image_url))
+    return results
+
+def get_total_products(apollo_data):
+    """读取首页APOLLO_STATE中 searchReport.totalProducts 给出的商品总数，缺失时返回 None。"""
+    search_model = find_search_model(apollo_data)
+    search_report = resolve_ref(apollo_data, search_model.get('searchReport')) if search_model else None
+    total_products = search_report.get('totalProducts') if isinstance(search_report, dict) else None
+    return total_products if isinstance(total_products, int) and total_products >= 0 else None
+
+def find_next_page_url(driver, timeout):
+    """等待"下一页"链接出现并返回其地址，超时仍未出现（通常即为最后一页）时返回 None。"""
+    try:
+        link = WebDriverWait(driver, timeout, poll_frequency=0.1).until(lambda d: d.find_element(*NEXT_PAGE_LOCATOR))
+    except TimeoutException:
+        return None
+    return link.get_attribute('href')
+
+def get_total_pages(driver, apollo_data):
+    """
+    计算搜索结果的总页数。
+
+    以首页APOLLO_STATE中 searchReport.totalProducts 换算的页数为准（分页导航可能只列出
+    当前页附近的若干页码，不能作为上限）；商品总数缺失时再读取分页导航中最大的页码，
+    导航不存在时视为只有 1 页。
+
+    Args:
+        driver: 已加载首页的浏览器驱动。
+        apollo_data (dict): 首页的APOLLO_STATE。
+
+    Returns:
+        int: 总页数。
+    """
+    total_products = get_total_products(apollo_data)
+    if total_products:
+        return -(-total_products // PAGE_SIZE)
+
+    page_links = driver.find_elements(*PAGE_LINKS_LOCATOR)
+    page_numbers = []
+    for link in page_links:
+        match = PAGE_NUMBER_RE.search(link.get_attribute('aria-label') or '')
+        if match:
+            page_numbers.append(int(match.group()))
+    return max(page_numbers, default=1)
+
+def build_page_url(next_page_url, page_num):
+    """以"下一页"链接为模板，替换 Nao 偏移量得到任意页的URL。"""
+    offset = PAGE_SIZE * (page_num - 1)
+    if NAO_PARAM_RE.search(next_page_url):
+        return NAO_PARAM_RE.sub(f'Nao={offset}', next_page_url)
+    separator = '&' if '?' in next_page_url else '?'
+    return f"{next_page_url}{separator}Nao={offset}"
+
+def build_http_session(driver):
+    """创建携带浏览器Cookie与UA的 requests 会话，用于直接抓取后续分页。"""
+    session = requests.Session()
+    # 连接池与线程池规模匹配，保持 keep-alive 复用；对限流和服务端错误做有限次退避重试
+    adapter = HTTPAdapter(pool_connections=MAX_HTTP_WORKERS, pool_maxsize=MAX_HTTP_WORKERS,
+                          max_retries=Retry(total=2, backoff_factor=0.3,
+                                            status_forcelist=[429, 500, 502, 503, 504]))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(HTTP_HEADERS)
+    # 以浏览器实际上报的UA为准，确保回放首页Cookie时两端身份一致
+    session.headers['User-Agent'] = driver.execute_script("return navigator.userAgent")
+    for cookie in driver.get_cookies():
+        session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/'))
+    return session
+
+class PageCache:
+    """
+    按URL保存分页的 ETag/Last-Modified 与解析结果，供条件请求复用。
+
+    同一实例会被多个抓取线程和会话同时读写，所有操作都在内部锁中完成；
+    条目数超过上限时淘汰最早写入的条目。
+    """
+
+    def __init__(self, max_entries=PAGE_CACHE_MAX_ENTRIES):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+
+    def get(self, url):
+        """返回 {"etag", "last_modified", "products"} 形式的缓存条目，不存在时返回 None。"""
+        with self._lock:
+            return self._entries.get(url)
+
+    def put(self, url, entry):
+        """写入（或覆盖）一个缓存条目。"""
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+class ResultCache:
+    """
+    按 (关键词, 页数) 保存完整的抓取结果，超过有效期的条目视为不存在。
+
+    只保存数据，不涉及任何界面元素；与 PageCache 一样在内部锁中完成读写，
+    条目数超过上限时淘汰最早写入的条目。
+    """
+
+    def __init__(self, ttl, max_entries=RESULT_CACHE_MAX_ENTRIES):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._ttl = ttl
+        self._max_entries = max_entries
+
+    def get(self, key):
+        """返回 (写入时的 time.monotonic(), 结果)，不存在或已过期时返回 None。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self._ttl:
+                del self._entries[key]
+                entry = None
+            return entry
+
+    def put(self, key, value):
+        """写入（或覆盖）一个结果。"""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+def fetch_page_products(session, page_cache, url, use_validators=True):
+    """
+    通过HTTP直接抓取单个分页并解析商品。
+
+    若该分页此前返回过 ETag/Last-Modified，则发送条件请求；服务器返回 304 时直接复用缓存的商品。
+
+    Args:
+        session (requests.Session): 携带浏览器Cookie的会话。
+        page_cache (PageCache): 跨次调用共享的分页缓存。
+        url (str): 分页URL。
+        use_validators (bool): 为 False 时忽略缓存，强制下载完整页面。
+
+    Returns:
+        list | None: 商品信息列表；请求失败、页面中没有数据块或数据块无法解析时返回 None，由调用方回退到浏览器。
+    """
+    cached = page_cache.get(url) if use_validators else None
+    headers = {}
+    if cached:
+        if cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    try:
+        response = session.get(url, headers=headers, timeout=20)
+        if response.status_code == 304 and cached:
+            return cached['products']
+        response.raise_for_status()
+    except requests.RequestException:
+        return None
+
+    try:
+        apollo_data = extract_apollo_state(response.content)
+        if apollo_data is None:
+            return None
+        products = parse_products(apollo_data)
+    except ValueError:
+        # 数据块被截断或后面紧跟其他脚本语句时JSON解析失败，同样交由浏览器回退处理
+        return None
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if etag or last_modified:
+        page_cache.put(url, {'etag': etag, 'last_modified': last_modified, 'products': products})
+    return products
+
+def load_page_with_driver(driver, wait, url):
+    """用浏览器加载单个分页并解析商品（HTTP 抓取失败时的回退路径）。"""
+    driver.get(url)
+    apollo_data = wait_for_apollo_state(wait)
+    return parse_products(apollo_data) if apollo_data else []
+
+# --- 浏览器驱动（跨任务复用） ---
+# 抓取只读取内联的JSON数据块，图片、样式、字体、视频与统计脚本均无需下载
+BLOCKED_URL_PATTERNS = [
+    "*.jpg", "*.jpeg", "*.png", "*.webp", "*.gif", "*.svg", "*.ico",
+    "*.css", "*.woff*", "*.mp4",
+    "*googletagmanager*", "*google-analytics*", "*doubleclick*",
+]
+
+def create_driver(profile_dir):
+    """创建一个使用指定配置目录、屏蔽了无关资源的无头Chrome实例。"""
+    options = webdriver.ChromeOptions()
+    # DOMContentLoaded 后即返回，不等待图片等子资源；数据脚本由 wait_for_apollo_state 轮询
+    options.page_load_strategy = 'eager'
+    for argument in CHROME_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_argument(f"--user-data-dir={profile_dir}")
+    options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+    driver = webdriver.Chrome(service=Service(), options=options)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return driver
+
+class SharedBrowser:
+    """
+    所有会话共用的无头Chrome，避免每次搜索都重新启动浏览器。
+
+    浏览器在首次使用时启动；同一时间只能服务一个抓取任务，调用方需持有 lock。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._driver = None
+        self._profile_lock = None  # 持有固定配置目录时的锁文件
+        self._temp_profile_dir = None  # 固定目录被占用时使用的临时配置目录
+
+    def _acquire_profile_dir(self, allow_shared=True):
+        """
+        为新的浏览器实例选择配置目录。
+
+        优先对 CHROME_PROFILE_LOCK 加非阻塞文件锁并使用固定目录；锁已被其他实例持有
+        （另一个应用进程，或清除缓存后仍在运行的旧浏览器）或锁文件无法打开时，改用一次性的临时目录。
+
+        Args:
+            allow_shared (bool): 为 False 时跳过固定目录，直接使用临时目录。
+
+        Returns:
+            str: 配置目录路径。
+        """
+        if allow_shared and fcntl is not None:
+            lock_file = None
+            try:
+                # 锁文件属于其他用户或临时目录只读时 open 也会失败，同样改用临时目录
+                lock_file = open(CHROME_PROFILE_LOCK, 'w')
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                if lock_file is not None:
+                    lock_file.close()
+            else:
+                self._profile_lock = lock_file
+                return CHROME_PROFILE_DIR
+        self._temp_profile_dir = tempfile.mkdtemp(prefix="hd_scraper_profile_")
+        return self._temp_profile_dir
+
+    def _release_profile_dir(self):
+        """释放固定目录的文件锁，或删除临时配置目录。"""
+        if self._profile_lock is not None:
+            self._profile_lock.close()
+            self._profile_lock = None
+        if self._temp_profile_dir is not None:
+            shutil.rmtree(self._temp_profile_dir, ignore_errors=True)
+            self._temp_profile_dir = None
+
+    def get(self):
+        """返回当前浏览器实例，尚未启动或已被重置时重新创建。"""
+        if self._driver is None:
+            profile_dir = self._acquire_profile_dir()
+            try:
+                try:
+                    self._driver = create_driver(profile_dir)
+                except SessionNotCreatedException:
+                    if profile_dir != CHROME_PROFILE_DIR:
+                        raise
+                    # 固定目录仍被锁外的Chrome占用（如上次异常退出遗留的进程），改用临时目录重试一次
+                    self._release_profile_dir()
+                    self._driver = create_driver(self._acquire_profile_dir(allow_shared=False))
+            except WebDriverException:
+                self._release_profile_dir()
+                raise
+        return self._driver
+
+    def reset(self):
+        """关闭浏览器进程并释放其配置目录，下次调用 get 时重新启动。"""
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except WebDriverException:
+                pass
+            self._driver = None
+        self._release_profile_dir()
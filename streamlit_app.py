@@ -1,146 +1,283 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import atexit
 import time
-import json
-from bs4 import BeautifulSoup
-import random
-import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import quote
 
 # --- Selenium 相关导入 ---
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, WebDriverException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from scraper_core import (
+    SITE_URL, SEARCH_URL, PAGE_SIZE, MAX_HTTP_WORKERS, NEXT_PAGE_WAIT, RESULT_COLUMNS,
+    PageCache, ResultCache, SharedBrowser,
+    build_http_session, build_page_url, fetch_page_products, find_next_page_url, get_total_pages,
+    get_total_products, load_page_with_driver, parse_products, wait_for_apollo_state,
+)
+
+RESULT_CACHE_TTL = 3600  # 搜索结果缓存时间（秒）
+PREVIEW_INTERVAL = 1.0  # 抓取过程中预览表格的最短刷新间隔（秒）
+PLACEHOLDER_IMAGE = 'https://placehold.co/100x100/e2e8f0/333333?text=No+Image'
+
+# --- 跨会话共享资源 ---
+@st.cache_resource
+def get_page_cache():
+    """跨会话共享的分页缓存，用于条件请求。"""
+    return PageCache()
+
+@st.cache_resource
+def get_result_cache():
+    """跨会话共享的搜索结果缓存，只保存正常抓取完毕的结果。"""
+    return ResultCache(ttl=RESULT_CACHE_TTL)
+
+@st.cache_resource
+def get_shared_browser():
+    """跨重跑与会话缓存 SharedBrowser，并在进程退出时关闭浏览器。"""
+    browser = SharedBrowser()
+    atexit.register(browser.reset)
+    return browser
 
 # --- 核心抓取逻辑 (简化了日志输出) ---
-def scrape_homedepot_with_selenium(query, max_pages_to_scrape):
+# 抓取过程中会实时刷新状态、进度与预览表格，这些界面元素不应进入缓存，因此函数本身不做缓存；
+# 正常抓取完毕的结果由调用方存入 get_result_cache()
+def scrape_homedepot_with_selenium(query, max_pages_to_scrape, debug=False, force_refresh=False):
     """
-    使用标准Selenium驱动浏览器，通过解析__APOLLO_STATE__数据块并智能翻页，抓取完整数据。
+    使用标准Selenium驱动浏览器加载首页并解析__APOLLO_STATE__数据块，
+    其余分页复用浏览器Cookie通过HTTP并行抓取，抓取完整数据。
 
     Args:
         query (str): 搜索关键词。
         max_pages_to_scrape (int): 用户指定的最大抓取页数。
+        debug (bool): 是否输出逐页详细日志与超时快照。
+        force_refresh (bool): 忽略分页条件请求缓存，重新下载所有分页。
 
     Returns:
-        list: 包含所有页面商品信息的字典列表。
+        tuple: (unique_results, duplicate_results, complete)。前两项均为 {列名: 值列表} 形式的列式数据：
+            前者为按名称去重后的商品信息，后者为名称与已抓取商品重复的记录，保留用于界面中的重复项展示。
+            complete 表示是否正常抓取完毕；超时或出错中断时为 False，此时前两项只含已抓取的部分结果。
     """
-    all_results = []
+    # 按列累积结果，最终可直接构造 DataFrame，省去逐行字典的类型推断
+    unique_results = {column: [] for column in RESULT_COLUMNS}
+    duplicate_results = {column: [] for column in RESULT_COLUMNS}
+    seen_names = set()
+    page_log = []  # 调试模式下的逐页日志，结束时一次性输出
+
+    def add_products(products):
+        # 抓取时即按名称去重，无需事后再对整个 DataFrame 做 drop_duplicates
+        for product in products:
+            if product.name in seen_names:
+                target = duplicate_results
+            else:
+                seen_names.add(product.name)
+                target = unique_results
+            for column, value in zip(RESULT_COLUMNS, product):
+                target[column].append(value)
+
     status_placeholder = st.empty()
-    driver = None
+    progress_placeholder = st.empty()
+    preview_placeholder = st.empty()
+    last_preview = 0.0
+
+    def update_preview(current_page, last_page):
+        # 边抓取边展示进度与已获得的商品，按时间间隔节流，避免每页都向前端推送一次更新
+        nonlocal last_preview
+        now = time.monotonic()
+        if now - last_preview < PREVIEW_INTERVAL:
+            return
+        last_preview = now
+        progress_placeholder.progress(current_page / last_page,
+                                      text=f"已处理 {current_page}/{last_page} 页 | 已抓取 {len(unique_results['name'])} 个商品")
+        preview_placeholder.dataframe(build_display_df(pd.DataFrame(unique_results)), column_config=display_column_config(),
+                                      hide_index=True, use_container_width=True)
+
+    browser = get_shared_browser()
+    browser.lock.acquire()
     
     try:
-        status_placeholder.info(f"🚀 正在配置标准版浏览器...")
-        options = webdriver.ChromeOptions()
-        options.add_argument("--headless")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--window-size=1920,1080")
-        options.add_argument(f"--user-data-dir=/tmp/selenium_user_data_{int(time.time())}")
-        options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36")
-        
-        service = Service()
-        driver = webdriver.Chrome(service=service, options=options)
-        
-        search_url = f"https://www.homedepot.com/s/{query.replace(' ', '%20')}"
-        status_placeholder.info(f"🕵️ 浏览器已启动，正在访问初始页面...")
-        driver.get(search_url)
-
         current_page = 1
+        # 非调试模式下只保留一条逐页更新的状态，避免频繁推送界面消息
+        status_placeholder.info("🚀 正在准备标准版浏览器..." if debug else f"⏳ 正在处理第 {current_page} 页...")
+        driver = browser.get()
         
-        while True:
-            if current_page > max_pages_to_scrape:
-                status_placeholder.info(f"已达到设定的最大抓取页数 ({max_pages_to_scrape})，任务结束。")
-                break
+        search_url = SEARCH_URL.format(quote(query, safe=''))
+        if debug:
+            status_placeholder.info("🕵️ 浏览器已启动，正在访问初始页面...")
+        driver.get(search_url)
 
-            status_text = f"⏳ 正在处理第 {current_page} 页 | 已抓取 {len(all_results)} 个商品..."
-            status_placeholder.info(status_text)
-            
-            wait = WebDriverWait(driver, 30)
-            
-            try:
-                # 1. 等待页面加载完成
-                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'nav[aria-label="Pagination Navigation"]')))
-                
-                # 2. 从HTML中提取APOLLO_STATE
-                soup = BeautifulSoup(driver.page_source, 'html.parser')
-                script_tag = soup.find('script', string=re.compile(r"window\.__APOLLO_STATE__"))
-                
-                if not script_tag:
-                    break
+        if debug:
+            status_placeholder.info(f"⏳ 正在处理第 {current_page} 页...")
+        wait = WebDriverWait(driver, 30, poll_frequency=0.05)
 
-                # 3. 精确提取并解析JSON
-                match = re.search(r'window\.__APOLLO_STATE__\s*=\s*({.*});', script_tag.string)
-                if not match:
-                    break
-                
-                json_text = match.group(1)
-                apollo_data = json.loads(json_text)
-                
-                products_list = []
-                for key in apollo_data:
-                    if isinstance(apollo_data[key], dict) and 'products' in str(apollo_data[key]):
-                        for sub_key, sub_value in apollo_data[key].items():
-                            if isinstance(sub_value, list) and sub_value and isinstance(sub_value[0], dict) and sub_value[0].get('__ref'):
-                                product_refs = sub_value
-                                for ref in product_refs:
-                                    product_id = ref.get('__ref')
-                                    if product_id and product_id in apollo_data:
-                                        products_list.append(apollo_data[product_id])
-                                if products_list: break
-                        if products_list: break
-
-                if not products_list:
-                    break
-                
-                for product in products_list:
-                    name = product.get('identifiers', {}).get('productLabel', 'N/A')
-                    pricing_key = next((k for k in product if k.startswith('pricing')), None)
-                    pricing_info = product.get(pricing_key, {}) if pricing_key else {}
-                    original_price = pricing_info.get('original')
-                    current_price = pricing_info.get('value')
-                    link = "https://www.homedepot.com" + product.get('identifiers', {}).get('canonicalUrl', '#')
-                    image_url = product.get('media', {}).get('images', [{}])[0].get('url')
-                    if image_url:
-                        image_url = image_url.replace("<SIZE>", "400")
-
-                    if name != 'N/A':
-                        all_results.append({
-                            'name': name, 'current_price': current_price, 'original_price': original_price,
-                            'link': link, 'image_url': image_url or 'https://placehold.co/100x100/e2e8f0/333333?text=No+Image'
-                        })
-
-            except TimeoutException:
-                status_placeholder.error(f"页面加载超时（第 {current_page} 页）。")
+        try:
+            # 1. 等待首页数据脚本出现，并直接从浏览器读取解析APOLLO_STATE
+            apollo_data = wait_for_apollo_state(wait)
+            if apollo_data is None:
+                return unique_results, duplicate_results, False
+            add_products(parse_products(apollo_data))
+        except TimeoutException:
+            status_placeholder.error(f"页面加载超时（第 {current_page} 页）。")
+            if debug:
                 st.image(driver.get_screenshot_as_png(), caption="超时快照")
-                break 
-
-            # 4. 寻找下一页的URL并导航
-            try:
-                next_page_element = driver.find_element(By.CSS_SELECTOR, 'a[aria-label="Skip to Next Page"]')
-                next_page_url = next_page_element.get_attribute('href')
-                driver.get(next_page_url)
-                current_page += 1
-                time.sleep(random.uniform(1.5, 3.5))
-            except NoSuchElementException:
+            return unique_results, duplicate_results, False
+
+        # 2. 根据商品总数与"下一页"链接计算需要抓取的其余分页；数据脚本先于分页导航就绪，需短暂等待导航渲染
+        total_products = get_total_products(apollo_data)
+        has_more_pages = total_products is None or total_products > PAGE_SIZE
+        next_page_url = find_next_page_url(driver, NEXT_PAGE_WAIT) if has_more_pages else None
+        if next_page_url is None:
+            if total_products is None or total_products <= PAGE_SIZE:
                 status_placeholder.success(f"✅ 已到达最后一页，抓取完成！共处理 {current_page} 页。")
-                break 
+                return unique_results, duplicate_results, True
+            # 商品总数表明还有后续分页但导航未出现时，以搜索地址为模板构造分页URL
+            next_page_url = search_url
+
+        last_page = min(get_total_pages(driver, apollo_data), max_pages_to_scrape)
+        page_urls = [build_page_url(next_page_url, page_num) for page_num in range(2, last_page + 1)]
+        if not page_urls:
+            status_placeholder.info(f"已达到设定的最大抓取页数 ({max_pages_to_scrape})，任务结束。")
+            return unique_results, duplicate_results, True
+        update_preview(current_page, last_page)
+
+        # 3. 复用浏览器Cookie，通过线程池并行抓取其余分页；按页码顺序逐页取回结果并即时展示
+        status_placeholder.info(f"⏳ 正在并行抓取第 2-{last_page} 页 | 已抓取 {len(unique_results['name'])} 个商品...")
+        session = build_http_session(driver)
+        executor = ThreadPoolExecutor(max_workers=min(MAX_HTTP_WORKERS, len(page_urls)))
+        try:
+            page_results = executor.map(partial(fetch_page_products, session, get_page_cache(), use_validators=not force_refresh), page_urls)
+
+            for current_page, (page_url, products) in enumerate(zip(page_urls, page_results), start=2):
+                source = "HTTP"
+                if products is None:
+                    source = "浏览器"
+                    # HTTP 请求被拦截或解析失败时，回退到浏览器逐页加载
+                    status_placeholder.info(f"⏳ 正在用浏览器处理第 {current_page} 页 | 已抓取 {len(unique_results['name'])} 个商品...")
+                    try:
+                        products = load_page_with_driver(driver, wait, page_url)
+                    except TimeoutException:
+                        status_placeholder.error(f"页面加载超时（第 {current_page} 页）。")
+                        if debug:
+                            st.image(driver.get_screenshot_as_png(), caption="超时快照")
+                        return unique_results, duplicate_results, False
+                if debug:
+                    page_log.append(f"第 {current_page} 页：通过{source}获取 {len(products)} 个商品")
+                if not products:
+                    break
+                add_products(products)
+                update_preview(current_page, last_page)
+        finally:
+            # 遇到空页或超时提前结束时，取消尚未开始的分页请求，不再等待它们下载完成
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        status_placeholder.success(f"✅ 抓取完成！共处理 {current_page} 页。")
+        return unique_results, duplicate_results, True
     
+    except WebDriverException as e:
+        # 浏览器崩溃或会话失效：丢弃缓存的实例，下次搜索时重新启动
+        status_placeholder.error(f"浏览器异常，已重置浏览器: {e}")
+        browser.reset()
     except Exception as e:
         status_placeholder.error(f"抓取过程中发生未知错误: {e}")
     finally:
-        if driver:
-            driver.quit()
+        browser.lock.release()
+        # 完整结果由调用方统一展示，抓取结束后移除进度条与预览
+        progress_placeholder.empty()
+        preview_placeholder.empty()
+        if page_log:
+            st.caption("  \n".join(page_log))
             
-    return all_results
+    # 仅在出现异常时到达这里
+    return unique_results, duplicate_results, False
+
+# --- 结果展示 ---
+def build_display_df(df, name_column="商品名称"):
+    """
+    将抓取结果整列转换为展示用表格，不再逐行 iterrows。
+
+    Args:
+        df (pd.DataFrame): 含 name/current_price/original_price/link/image_url 列的抓取结果，
+            link 为站内相对路径，image_url 为含 <SIZE> 占位符的图片模板。
+        name_column (str): 商品名称列的显示标题。
+
+    Returns:
+        pd.DataFrame: 列名与格式与界面表格一致的展示数据。
+    """
+    current_price = df['current_price'].astype('Float64')
+    original_price = df['original_price'].astype('Float64')
+    # 原价仅在与现售价不同时显示；价格保持数值类型，由 NumberColumn 在前端格式化
+    show_original = original_price.ne(current_price).fillna(True)
+    # 图片尺寸替换与链接补全按整列执行，缺图的行填入占位图
+    image_url = df['image_url'].astype('string').str.replace("<SIZE>", "400", regex=False).fillna(PLACEHOLDER_IMAGE)
+    return pd.DataFrame({
+        "序号": np.arange(1, len(df) + 1),
+        "图片": image_url,
+        name_column: df['name'],
+        "原价": original_price.where(show_original),
+        "现售价": current_price,
+        "链接": SITE_URL + df['link'].astype('string'),
+    })
+
+def display_column_config(name_column="商品名称"):
+    """返回 build_display_df 输出表格对应的 st.dataframe 列配置。"""
+    return {
+        "序号": st.column_config.NumberColumn("序号", width="small", format="%d"),
+        "图片": st.column_config.ImageColumn("图片预览", width="small"),
+        name_column: st.column_config.TextColumn(name_column, width="large"),
+        "原价": st.column_config.NumberColumn("原价", width="small", format="$%.2f"),
+        "现售价": st.column_config.NumberColumn("现售价", width="small", format="$%.2f"),
+        "链接": st.column_config.LinkColumn("详情链接", display_text="🔗 查看商品", width="small")
+    }
+
+def render_results(unique_results, duplicate_results):
+    """
+    展示单个关键词的抓取结果：独立商品表格，以及按名称分组的重复项。
+
+    Args:
+        unique_results (dict): 去重后的列式商品数据。
+        duplicate_results (dict): 名称重复的列式商品数据。
+    """
+    if not unique_results['name']:
+        st.error("未能抓取到任何商品信息，请查看上方的日志分析原因。")
+        return
+
+    st.success(f"🎉 **任务结束！共获得 {len(unique_results['name']) + len(duplicate_results['name'])} 条商品信息！**")
+    
+    unique_df = pd.DataFrame(unique_results)
+    duplicate_rows_df = pd.DataFrame()
+    if duplicate_results['name']:
+        # 找出所有重复的行（包括第一次出现的），按名称分组
+        duplicate_df = pd.DataFrame(duplicate_results)
+        first_seen_df = unique_df[unique_df['name'].isin(duplicate_df['name'])]
+        duplicate_rows_df = pd.concat([first_seen_df, duplicate_df]).sort_values('name', kind='stable').reset_index(drop=True)
+    
+    st.info(f"去重后剩余 {len(unique_df)} 条独立商品信息。")
+    
+    st.subheader("独立商品信息")
+    display_unique_data = build_display_df(unique_df)
+    
+    st.dataframe(display_unique_data, column_config=display_column_config(), hide_index=True, use_container_width=True)
+
+    if not duplicate_rows_df.empty:
+        with st.expander(f"查看 {len(duplicate_rows_df)} 条存在重复的商品信息（按名称分组）"):
+            st.subheader("重复抓取的商品信息")
+            display_duplicate_data = build_display_df(duplicate_rows_df, name_column="商品名称 (重复项)")
+            
+            st.dataframe(display_duplicate_data, column_config=display_column_config("商品名称 (重复项)"),
+                         hide_index=True, use_container_width=True)
 
 # --- Streamlit 应用界面 ---
 st.set_page_config(page_title="在线商品信息工具", layout="wide")
 st.title("🛒 在线商品信息工具")
+DEBUG = st.sidebar.checkbox("详细日志", value=False)
+if st.sidebar.button("重置浏览器", help="关闭共享的浏览器实例，下次搜索时重新启动"):
+    shared_browser = get_shared_browser()
+    with shared_browser.lock:
+        shared_browser.reset()
+    st.sidebar.success("浏览器已重置。")
 
-search_query = st.text_input("请输入搜索关键词:", "milwaukee")
+search_queries = st.text_area("请输入搜索关键词（每行一个）:", "milwaukee")
 
 col1, col2 = st.columns([1, 4])
 with col1:
@@ -152,65 +289,37 @@ with col2:
         max_pages_to_scrape = 999
         st.write("将抓取所有可用的页面。")
 
+force_refresh = st.checkbox("强制刷新", value=False, help="忽略已缓存的搜索结果与分页，重新抓取")
+
 
 if st.button("🚀 开始搜索"):
-    if not search_query:
+    # 每行一个关键词；不区分大小写并合并空白后去重，规范化结果同时作为缓存键
+    queries = list(dict.fromkeys(" ".join(line.split()).lower() for line in search_queries.splitlines() if line.strip()))
+    if not queries:
         st.warning("请输入搜索关键词！")
     else:
-        all_scraped_data = scrape_homedepot_with_selenium(search_query, max_pages_to_scrape)
+        # 共享浏览器同一时间只服务一个任务，关键词依次抓取；每个关键词的后续分页仍并行获取
+        result_cache = get_result_cache()
+        all_query_results = {}
+        for query in queries:
+            if len(queries) > 1:
+                st.markdown(f"**{query}**")
+            # 相同的 (关键词, 页数) 在有效期内直接使用缓存结果；强制刷新或需要详细日志时重新抓取
+            cache_key = (query, max_pages_to_scrape)
+            cached = None if force_refresh or DEBUG else result_cache.get(cache_key)
+            if cached:
+                stored_at, (unique_results, duplicate_results) = cached
+                st.info(f"⚡ 使用 {int(time.monotonic() - stored_at) // 60} 分钟前抓取的缓存结果，勾选“强制刷新”可重新抓取。")
+            else:
+                unique_results, duplicate_results, complete = scrape_homedepot_with_selenium(query, max_pages_to_scrape, debug=DEBUG, force_refresh=force_refresh)
+                if complete and unique_results['name']:
+                    result_cache.put(cache_key, (unique_results, duplicate_results))
+                elif unique_results['name']:
+                    # 失败或中途中断的结果不写入缓存，下次点击会重新抓取
+                    st.warning("抓取中途中断，下方仅为部分结果，再次搜索时将重新抓取。")
+            all_query_results[query] = (unique_results, duplicate_results)
 
-        if all_scraped_data:
-            st.success(f"🎉 **任务结束！共获得 {len(all_scraped_data)} 条商品信息！**")
-            
-            full_df = pd.DataFrame(all_scraped_data)
-            unique_df = full_df.drop_duplicates(subset=['name'], keep='first').reset_index(drop=True)
-            # 找出所有重复的行（包括第一次出现的）
-            duplicate_rows_df = full_df[full_df.duplicated(subset=['name'], keep=False)].sort_values('name').reset_index(drop=True)
-            
-            st.info(f"去重后剩余 {len(unique_df)} 条独立商品信息。")
-            
-            st.subheader("独立商品信息")
-            display_unique_data = [{
-                "序号": index + 1,
-                "图片": row['image_url'],
-                "商品名称": row['name'],
-                "原价": f"${row['original_price']}" if pd.notna(row['original_price']) and row['original_price'] != row['current_price'] else " ",
-                "现售价": f"${row['current_price']}" if pd.notna(row['current_price']) else 'N/A',
-                "链接": row['link']
-            } for index, row in unique_df.iterrows()]
-            
-            st.dataframe(
-                display_unique_data,
-                column_config={
-                    "序号": st.column_config.NumberColumn("序号", width="small", format="%d"),
-                    "图片": st.column_config.ImageColumn("图片预览", width="small"),
-                    "商品名称": st.column_config.TextColumn("商品名称", width="large"),
-                    "原价": st.column_config.TextColumn("原价", width="small"),
-                    "现售价": st.column_config.TextColumn("现售价", width="small"),
-                    "链接": st.column_config.LinkColumn("详情链接", display_text="🔗 查看商品", width="small")
-                }, hide_index=True, use_container_width=True)
-
-            if not duplicate_rows_df.empty:
-                with st.expander(f"查看 {len(duplicate_rows_df)} 条存在重复的商品信息（按名称分组）"):
-                    st.subheader("重复抓取的商品信息")
-                    display_duplicate_data = [{
-                        "序号": index + 1,
-                        "图片": row['image_url'],
-                        "商品名称 (重复项)": row['name'],
-                        "原价": f"${row['original_price']}" if pd.notna(row['original_price']) and row['original_price'] != row['current_price'] else " ",
-                        "现售价": f"${row['current_price']}" if pd.notna(row['current_price']) else 'N/A',
-                        "链接": row['link']
-                    } for index, row in duplicate_rows_df.iterrows()]
-                    
-                    st.dataframe(
-                        display_duplicate_data,
-                        column_config={
-                            "序号": st.column_config.NumberColumn("序号", width="small", format="%d"),
-                            "图片": st.column_config.ImageColumn("图片预览", width="small"),
-                            "商品名称 (重复项)": st.column_config.TextColumn("商品名称 (重复项)", width="large"),
-                            "原价": st.column_config.TextColumn("原价", width="small"),
-                            "现售价": st.column_config.TextColumn("现售价", width="small"),
-                            "链接": st.column_config.LinkColumn("详情链接", display_text="🔗 查看商品", width="small")
-                        }, hide_index=True, use_container_width=True)
-        else:
-            st.error("未能抓取到任何商品信息，请查看上方的日志分析原因。")
+        result_areas = st.tabs(queries) if len(queries) > 1 else [st.container()]
+        for result_area, query in zip(result_areas, queries):
+            with result_area:
+                render_results(*all_query_results[query])
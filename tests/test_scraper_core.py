@@ -0,0 +1,163 @@
+import json
+
+import pytest
+
+import scraper_core
+from scraper_core import (
+    PAGE_SIZE, PageCache, ProductRecord, build_page_url, extract_apollo_state, fetch_page_products,
+    find_product_refs, get_total_pages, parse_products,
+)
+
+
+# --- 测试数据与替身 ---
+def make_product(name, value=10.0, original=12.0, images=None):
+    """构造一个 Apollo 中规范化后的商品条目。"""
+    product = {
+        'identifiers': {'productLabel': name, 'canonicalUrl': f'/p/{name}'},
+        'pricing({"storeId":"121"})': {'value': value, 'original': original},
+    }
+    if images is not None:
+        product['media'] = {'images': images}
+    return product
+
+def make_state(search_model, products):
+    """以 ROOT_QUERY.searchModel(...) 为入口构造 APOLLO_STATE。"""
+    state = {'ROOT_QUERY': {'searchModel({"keyword":"drill"})': search_model}}
+    state.update(products)
+    return state
+
+PRODUCTS = {
+    'BaseProduct:1': make_product('Drill', images=[{'url': 'https://images.example/1_<SIZE>.jpg'}]),
+    'BaseProduct:2': make_product('Saw', value=5.0, original=5.0),
+}
+REFS = [{'__ref': 'BaseProduct:1'}, {'__ref': 'BaseProduct:2'}]
+
+class FakeLink:
+    def __init__(self, label):
+        self.label = label
+
+    def get_attribute(self, name):
+        return self.label
+
+class FakeDriver:
+    def __init__(self, page_numbers=()):
+        self.page_numbers = page_numbers
+
+    def find_elements(self, by, selector):
+        return [FakeLink(f"Go to Page {n}") for n in self.page_numbers]
+
+class FakeResponse:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise scraper_core.requests.HTTPError(str(self.status_code))
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.sent_headers = None
+
+    def get(self, url, headers=None, timeout=None):
+        self.sent_headers = headers
+        return self.response
+
+def page_html(state):
+    return f'<html><script>window.__APOLLO_STATE__ = {json.dumps(state)};</script></html>'.encode()
+
+
+# --- 数据块提取 ---
+def test_extract_apollo_state_reads_the_assigned_object():
+    state = {'ROOT_QUERY': {'a': 1}}
+    assert extract_apollo_state(page_html(state)) == state
+
+def test_extract_apollo_state_returns_none_without_marker():
+    assert extract_apollo_state(b'<html><script>var x = {};</script></html>') is None
+
+
+# --- 商品定位与解析 ---
+def test_find_product_refs_follows_searchmodel_ref():
+    state = make_state({'__ref': 'SearchModel:1'}, PRODUCTS)
+    state['SearchModel:1'] = {'products': REFS}
+    assert find_product_refs(state) == REFS
+
+def test_find_product_refs_reads_inline_searchmodel():
+    assert find_product_refs(make_state({'products': REFS}, PRODUCTS)) == REFS
+
+def test_find_product_refs_matches_argument_keyed_products_field():
+    search_model = {'products({"startIndex":0,"pageSize":24})': REFS}
+    assert find_product_refs(make_state(search_model, PRODUCTS)) == REFS
+
+def test_find_product_refs_falls_back_to_top_level_scan():
+    state = {'SearchModel:1': {'products({"startIndex":0})': REFS}, **PRODUCTS}
+    assert find_product_refs(state) == REFS
+
+def test_find_product_refs_returns_empty_list_when_missing():
+    assert find_product_refs({'ROOT_QUERY': {}}) == []
+
+def test_parse_products_builds_records():
+    drill, saw = parse_products(make_state({'products': REFS}, PRODUCTS))
+    assert drill == ProductRecord('Drill', 10.0, 12.0, '/p/Drill', 'https://images.example/1_<SIZE>.jpg')
+    assert saw.current_price == saw.original_price == 5.0
+
+@pytest.mark.parametrize('images', [[], None])
+def test_parse_products_without_images_leaves_image_url_empty(images):
+    products = {'BaseProduct:1': make_product('Drill', images=images)}
+    (record,) = parse_products(make_state({'products': [{'__ref': 'BaseProduct:1'}]}, products))
+    assert record.image_url is None
+
+def test_parse_products_skips_unlabelled_products():
+    products = {'BaseProduct:1': {'identifiers': {}}}
+    assert parse_products(make_state({'products': [{'__ref': 'BaseProduct:1'}]}, products)) == []
+
+
+# --- 分页 ---
+def test_get_total_pages_uses_total_products_over_nav():
+    search_model = {'products': REFS, 'searchReport': {'totalProducts': 21 * PAGE_SIZE - 4}}
+    # 分页导航只列出当前页附近的页码，不能作为上限
+    assert get_total_pages(FakeDriver(range(1, 6)), make_state(search_model, PRODUCTS)) == 21
+
+def test_get_total_pages_falls_back_to_nav_links():
+    assert get_total_pages(FakeDriver([1, 2, 7]), make_state({'products': REFS}, PRODUCTS)) == 7
+
+def test_get_total_pages_defaults_to_one():
+    assert get_total_pages(FakeDriver(), {}) == 1
+
+def test_build_page_url_replaces_existing_offset():
+    url = 'https://www.homedepot.com/s/drill?NCNI-5&Nao=24'
+    assert build_page_url(url, 3) == 'https://www.homedepot.com/s/drill?NCNI-5&Nao=48'
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://www.homedepot.com/s/drill', 'https://www.homedepot.com/s/drill?Nao=72'),
+    ('https://www.homedepot.com/s/drill?NCNI-5', 'https://www.homedepot.com/s/drill?NCNI-5&Nao=72'),
+])
+def test_build_page_url_appends_offset(url, expected):
+    assert build_page_url(url, 4) == expected
+
+
+# --- HTTP 分页抓取 ---
+def test_fetch_page_products_reuses_cache_on_304():
+    url = 'https://www.homedepot.com/s/drill?Nao=24'
+    cached_products = [ProductRecord('Drill', 10.0, 12.0, '/p/Drill', None)]
+    page_cache = PageCache()
+    page_cache.put(url, {'etag': '"abc"', 'last_modified': 'Wed, 14 Oct 2026 08:00:00 GMT', 'products': cached_products})
+    session = FakeSession(FakeResponse(304))
+
+    assert fetch_page_products(session, page_cache, url) is cached_products
+    assert session.sent_headers == {'If-None-Match': '"abc"', 'If-Modified-Since': 'Wed, 14 Oct 2026 08:00:00 GMT'}
+
+def test_fetch_page_products_stores_validators():
+    url = 'https://www.homedepot.com/s/drill?Nao=24'
+    page_cache = PageCache()
+    response = FakeResponse(200, page_html(make_state({'products': REFS}, PRODUCTS)), {'ETag': '"abc"'})
+
+    products = fetch_page_products(FakeSession(response), page_cache, url)
+    assert [p.name for p in products] == ['Drill', 'Saw']
+    assert page_cache.get(url)['etag'] == '"abc"'
+
+def test_fetch_page_products_returns_none_on_undecodable_state():
+    content = b'<script>window.__APOLLO_STATE__ = {"a": 1}; window.__X__ = {"b": 2};</script>'
+    assert fetch_page_products(FakeSession(FakeResponse(200, content)), PageCache(), 'u') is None